@@ -108,8 +108,30 @@ class ImageTransform:
         self.to_tensor_transform = transforms.ToTensor()
         self.normalize_transform = transforms.Normalize(mean=image_mean, std=image_std, inplace=True)
 
+        # (x / 255 - mean) / std folded into a single x * scale + bias
+        std = torch.tensor(image_std, dtype=torch.float32).view(-1, 1, 1)
+        mean = torch.tensor(image_mean, dtype=torch.float32).view(-1, 1, 1)
+        self.scale = 1.0 / (255.0 * std)
+        self.bias = -mean / std
+
+    def _to_normalized_tensor(self, img):
+        """Fused ToTensor + Normalize for RGB PIL images.
+
+        The uint8 HWC pixels are cast, transposed and scaled into a contiguous float CHW
+        tensor in one pass, then shifted in place, instead of the separate permute, cast,
+        divide, subtract and divide passes of ToTensor followed by Normalize. np.array
+        copies the pixels because the buffer PIL exposes is read-only, which
+        torch.from_numpy warns about.
+        """
+        arr = torch.from_numpy(np.array(img)).permute(2, 0, 1)
+        out = torch.empty(arr.shape, dtype=torch.float32)
+        torch.mul(arr, self.scale, out=out)
+        return out.add_(self.bias)
+
     def __call__(self, img, img_num=1):
         img = self.resize_transform(img, img_num=img_num)
+        if isinstance(img, Image.Image) and img.mode == 'RGB':
+            return self._to_normalized_tensor(img)
         img = self.to_tensor_transform(img)
         img = self.normalize_transform(img)
         return img
@@ -27,12 +27,48 @@ class InterleaveInferencer:
         self.vae_transform = vae_transform
         self.vit_transform = vit_transform
         self.new_token_ids = new_token_ids
+        self._kv_cache = None
+        self._seed = None
+        self._generators = {}
+
+    def manual_seed(self, seed):
+        """Seed the sampling generators of this inferencer without touching the global RNGs."""
+        self._seed = seed
+        for generator in self._generators.values():
+            generator.manual_seed(seed)
+
+    def get_generator(self, device):
+        device = torch.device(device)
+        if device.type == 'cuda' and device.index is None:
+            device = torch.device('cuda', torch.cuda.current_device())
+        generator = self._generators.get(device)
+        if generator is None:
+            generator = torch.Generator(device=device)
+            if self._seed is not None:
+                generator.manual_seed(self._seed)
+            else:
+                generator.seed()
+            self._generators[device] = generator
+        return generator
+
+    @staticmethod
+    def _execution_device(module):
+        # accelerate records where offloaded modules run on their hook
+        device = getattr(getattr(module, '_hf_hook', None), 'execution_device', None)
+        if device is not None:
+            return torch.device(device)
+        return next(module.parameters()).device
         
     def init_gen_context(self): 
+        # reuse the KV buffers grown by the previous call instead of reallocating them
+        if self._kv_cache is None:
+            self._kv_cache = NaiveCache(self.model.config.llm_config.num_hidden_layers)
+        else:
+            self._kv_cache.reset()
         gen_context = {
             'kv_lens': [0],
             'ropes': [0],
-            'past_key_values': NaiveCache(self.model.config.llm_config.num_hidden_layers),
+            'past_key_values': self._kv_cache,
         }
         return gen_context
 
@@ -67,16 +103,26 @@ class InterleaveInferencer:
         kv_lens = gen_context['kv_lens']
         ropes =  gen_context['ropes']
 
+        vae_transform, vit_transform = self.vae_transform, self.vit_transform
+        if isinstance(image, dict):
+            # already transformed by the caller (see LoadEditImage), reuse its tensors
+            vae_transform = lambda _: image['vae']
+            vit_transform = lambda _: image['vit']
+            image = image['pil']
+
         if vae:
             ## update vae
             generation_input, kv_lens, ropes = self.model.prepare_vae_images(
                 curr_kvlens=kv_lens,
                 curr_rope=ropes, 
                 images=[image],
-                transforms=self.vae_transform, 
+                transforms=vae_transform, 
                 new_token_ids=self.new_token_ids,
             )
-            past_key_values = self.model.forward_cache_update_vae(self.vae_model, past_key_values, **generation_input)
+            generator = self.get_generator(next(self.vae_model.parameters()).device)
+            past_key_values = self.model.forward_cache_update_vae(
+                self.vae_model, past_key_values, generator=generator, **generation_input
+            )
         
         if vit:
             ## update vit
@@ -84,7 +130,7 @@ class InterleaveInferencer:
                 curr_kvlens=kv_lens,
                 curr_rope=ropes, 
                 images=[image],
-                transforms=self.vit_transform, 
+                transforms=vit_transform, 
                 new_token_ids=self.new_token_ids,
             )
             past_key_values = self.model.forward_cache_update_vit(past_key_values, **generation_input)
@@ -121,6 +167,7 @@ class InterleaveInferencer:
             curr_rope=ropes, 
             image_sizes=[image_shape], 
             new_token_ids=self.new_token_ids,
+            generator=self.get_generator('cpu'),
         ) 
         
         # text cfg
@@ -196,6 +243,7 @@ class InterleaveInferencer:
             do_sample=do_sample,
             temperature=temperature,
             end_token_id=self.new_token_ids['eos_token_id'],
+            generator=self.get_generator(self._execution_device(self.model.language_model.lm_head)),
             **generation_input,
         )
         output = self.tokenizer.decode(unpacked_latent[:,0])
@@ -249,6 +297,12 @@ class InterleaveInferencer:
                     image_shapes = input_term.size[::-1]
                     cfg_text_context = deepcopy(gen_context)
 
+                elif isinstance(input_term, dict):
+                    gen_context = self.update_context_image(input_term, gen_context, vae=not understanding_output)
+
+                    image_shapes = input_term['pil'].size[::-1]
+                    cfg_text_context = deepcopy(gen_context)
+
                 else:
                     raise ValueError(f"Unsupported input type: {type(input_term)}")
 
@@ -283,7 +337,7 @@ class InterleaveInferencer:
     
     def __call__(
         self, 
-        image: Optional[Image.Image] = None, 
+        image: Optional[Union[Image.Image, Dict[str, Any]]] = None, 
         text: Optional[str] = None, 
         **kargs
     ) -> Dict[str, Any]:
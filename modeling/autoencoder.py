@@ -10,6 +10,7 @@
 # This modified file is released under the same license.
 
 from dataclasses import dataclass
+from typing import Optional
 
 import torch
 from einops import rearrange
@@ -279,11 +280,12 @@ class DiagonalGaussian(nn.Module):
         self.sample = sample
         self.chunk_dim = chunk_dim
 
-    def forward(self, z: Tensor) -> Tensor:
+    def forward(self, z: Tensor, generator: Optional[torch.Generator] = None) -> Tensor:
         mean, logvar = torch.chunk(z, 2, dim=self.chunk_dim)
         if self.sample:
             std = torch.exp(0.5 * logvar)
-            return mean + std * torch.randn_like(mean)
+            noise = torch.randn(mean.shape, generator=generator, device=mean.device, dtype=mean.dtype)
+            return mean + std * noise
         else:
             return mean
 
@@ -313,13 +315,15 @@ class AutoEncoder(nn.Module):
         self.scale_factor = params.scale_factor
         self.shift_factor = params.shift_factor
 
-    def encode(self, x: Tensor) -> Tensor:
-        z = self.reg(self.encoder(x))
+    def encode(self, x: Tensor, generator: Optional[torch.Generator] = None) -> Tensor:
+        x = x.contiguous(memory_format=torch.channels_last)
+        z = self.reg(self.encoder(x), generator=generator)
         z = self.scale_factor * (z - self.shift_factor)
         return z
 
     def decode(self, z: Tensor) -> Tensor:
         z = z / self.scale_factor + self.shift_factor
+        z = z.contiguous(memory_format=torch.channels_last)
         return self.decoder(z)
 
     def forward(self, x: Tensor) -> Tensor:
@@ -501,12 +501,13 @@ class Bagel(PreTrainedModel):
         packed_indexes: torch.LongTensor,
         key_values_lens: torch.IntTensor,
         packed_key_value_indexes: torch.Tensor,
+        generator: Optional[torch.Generator] = None,
     ):
         packed_text_embedding = self.language_model.model.embed_tokens(packed_text_ids)
         packed_sequence = packed_text_embedding.new_zeros((sum(packed_seqlens), self.hidden_size))
         packed_sequence[packed_text_indexes] = packed_text_embedding
 
-        padded_latent = vae_model.encode(padded_images)
+        padded_latent = vae_model.encode(padded_images, generator=generator)
 
         p = self.latent_patch_size
         packed_latent = list()
@@ -544,7 +545,7 @@ class Bagel(PreTrainedModel):
 
         return past_key_values
 
-    def prepare_vae_latent(self, curr_kvlens, curr_rope, image_sizes, new_token_ids):
+    def prepare_vae_latent(self, curr_kvlens, curr_rope, image_sizes, new_token_ids, generator=None):
         packed_text_ids, packed_text_indexes = list(), list()
         packed_vae_position_ids, packed_vae_token_indexes, packed_init_noises = list(), list(), list()
         packed_position_ids, packed_seqlens, packed_indexes = list(), list(), list()
@@ -571,7 +572,7 @@ class Bagel(PreTrainedModel):
             h, w = H // self.latent_downsample, W // self.latent_downsample
             num_image_tokens = h * w
             packed_init_noises.append(
-                torch.randn(num_image_tokens, self.latent_channel * self.latent_patch_size ** 2)
+                torch.randn(num_image_tokens, self.latent_channel * self.latent_patch_size ** 2, generator=generator)
             )
             packed_vae_token_indexes.extend(range(query_curr, query_curr + num_image_tokens))
             packed_indexes.extend(range(curr, curr + num_image_tokens))
@@ -889,6 +890,7 @@ class Bagel(PreTrainedModel):
         do_sample: bool = False,
         temperature: float = 1.0,
         end_token_id: int = None,
+        generator: Optional[torch.Generator] = None,
     ):
         step = 0
         generated_sequence = []
@@ -930,7 +932,7 @@ class Bagel(PreTrainedModel):
 
             if do_sample:
                 probs = nn.functional.softmax(pred_logits / temperature, dim=-1)
-                curr_tokens = torch.multinomial(probs, num_samples=1).squeeze(1)
+                curr_tokens = torch.multinomial(probs, num_samples=1, generator=generator).squeeze(1)
             else:
                 curr_tokens = torch.argmax(pred_logits, dim=-1)
 
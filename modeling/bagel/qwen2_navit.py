@@ -205,6 +205,71 @@ class NaiveCache:
     def __init__(self, num_layers):
         self.key_cache = {k: None for k in range(num_layers)}
         self.value_cache = {k: None for k in range(num_layers)}
+        # Per-layer backing storage; key_cache/value_cache are prefix views into it once
+        # entries have been appended through `append`.
+        self.key_buffer = {k: None for k in range(num_layers)}
+        self.value_buffer = {k: None for k in range(num_layers)}
+
+    def __deepcopy__(self, memo):
+        # Copy only the cached entries, not the spare capacity of the buffers.
+        new = self.__class__(self.num_layers)
+        for k in range(self.num_layers):
+            if self.key_cache[k] is not None:
+                new.key_cache[k] = self.key_cache[k].clone()
+                new.value_cache[k] = self.value_cache[k].clone()
+        memo[id(self)] = new
+        return new
+
+    def reset(self):
+        """Drop the cached entries but keep the allocated buffers for the next sequence."""
+        for k in range(self.num_layers):
+            self.key_cache[k] = None
+            self.value_cache[k] = None
+            # Inference tensors cannot be written to outside inference mode (and vice versa
+            # for autograd bookkeeping), so only keep buffers created in the current mode.
+            buffer = self.key_buffer[k]
+            if buffer is not None and buffer.is_inference() != torch.is_inference_mode_enabled():
+                self.key_buffer[k] = None
+                self.value_buffer[k] = None
+
+    def append(self, layer_idx, key_states, value_states):
+        """Return the cached entries of `layer_idx` followed by `key_states`/`value_states`.
+
+        The new entries are written right after the cached ones in a buffer that grows
+        geometrically, so the past is not re-copied on every call. The cache itself is
+        not extended; callers persist the result by storing the returned views.
+        """
+        past_key_states = self.key_cache[layer_idx]
+        past_value_states = self.value_cache[layer_idx]
+        past_len = 0 if past_key_states is None else past_key_states.shape[0]
+        total_len = past_len + key_states.shape[0]
+
+        key_buffer = self.key_buffer[layer_idx]
+        value_buffer = self.value_buffer[layer_idx]
+        if (
+            key_buffer is None
+            or key_buffer.shape[0] < total_len
+            or key_buffer.device != key_states.device
+            or key_buffer.dtype != key_states.dtype
+            or (past_key_states is not None and key_buffer.data_ptr() != past_key_states.data_ptr())
+            or (past_value_states is not None and value_buffer.data_ptr() != past_value_states.data_ptr())
+        ):
+            capacity = max(total_len, 2 * past_len)
+            key_buffer = key_states.new_empty((capacity, *key_states.shape[1:]))
+            value_buffer = value_states.new_empty((capacity, *value_states.shape[1:]))
+            self.key_buffer[layer_idx] = key_buffer
+            self.value_buffer[layer_idx] = value_buffer
+            if past_key_states is not None:
+                key_buffer[:past_len] = past_key_states
+                value_buffer[:past_len] = past_value_states
+                # Keep the cached entries as views into the new buffer, so appends that are
+                # not persisted (e.g. every denoising step) reuse it instead of reallocating.
+                self.key_cache[layer_idx] = key_buffer[:past_len]
+                self.value_cache[layer_idx] = value_buffer[:past_len]
+
+        key_buffer[past_len:total_len] = key_states
+        value_buffer[past_len:total_len] = value_states
+        return key_buffer[:total_len], value_buffer[:total_len]
 
     @property
     def num_layers(self):
@@ -335,7 +400,16 @@ class PackedAttention(Qwen2Attention):
         packed_key_states = packed_key_states.to(torch.bfloat16)
         packed_value_states = packed_value_states.to(torch.bfloat16)
 
-        if past_key_values is not None and past_key_values.key_cache[self.layer_idx] is not None:
+        if past_key_values is not None and len(query_lens) == 1:
+            # a single sequence: the new tokens directly follow the cached ones
+            if past_key_values.key_cache[self.layer_idx] is not None:
+                key_values_lens = key_values_lens + query_lens
+            else:
+                key_values_lens = query_lens
+            merged_key_states, merged_value_states = past_key_values.append(
+                self.layer_idx, packed_key_states, packed_value_states
+            )
+        elif past_key_values is not None and past_key_values.key_cache[self.layer_idx] is not None:
             past_key_states = past_key_values.key_cache[self.layer_idx]
             past_value_states = past_key_values.value_cache[self.layer_idx]
 
@@ -553,7 +627,16 @@ class PackedAttentionMoT(Qwen2Attention):
         packed_key_states = packed_key_states.to(torch.bfloat16)
         packed_value_states = packed_value_states.to(torch.bfloat16)
 
-        if past_key_values is not None and past_key_values.key_cache[self.layer_idx] is not None:
+        if past_key_values is not None and len(query_lens) == 1:
+            # a single sequence: the new tokens directly follow the cached ones
+            if past_key_values.key_cache[self.layer_idx] is not None:
+                key_values_lens = key_values_lens + query_lens
+            else:
+                key_values_lens = query_lens
+            merged_key_states, merged_value_states = past_key_values.append(
+                self.layer_idx, packed_key_states, packed_value_states
+            )
+        elif past_key_values is not None and past_key_values.key_cache[self.layer_idx] is not None:
             past_key_states = past_key_values.key_cache[self.layer_idx]
             past_value_states = past_key_values.value_cache[self.layer_idx]
 
@@ -1,26 +1,14 @@
 import os
-from copy import deepcopy
-from typing import (
-    Any,
-    AsyncIterable,
-    Callable,
-    Dict,
-    Generator,
-    List,
-    NamedTuple,
-    Optional,
-    Tuple,
-    Union,
-)
-import requests
-from io import BytesIO
-import random
-import numpy as np
+import math
+import logging
+import functools
+from types import MappingProxyType
+import psutil
 
 from PIL import Image
 import torch
-from accelerate import infer_auto_device_map, load_checkpoint_and_dispatch, init_empty_weights
-from safetensors.torch import load_file
+from accelerate import infer_auto_device_map, init_empty_weights, dispatch_model
+from safetensors import safe_open
 
 from .data.transforms import ImageTransform
 from .data.data_utils import pil_img2rgb, add_special_tokens
@@ -28,40 +16,271 @@ from .modeling.bagel import (
     BagelConfig, Bagel, Qwen2Config, Qwen2ForCausalLM, SiglipVisionConfig, SiglipVisionModel
 )
 from .modeling.qwen2 import Qwen2Tokenizer
-from .modeling.bagel.qwen2_navit import NaiveCache
 from .modeling.autoencoder import load_ae
 from .inferencer import InterleaveInferencer
 
 
+logger = logging.getLogger(__name__)
+
+VAE_TRANSFORM = ImageTransform(1024, 512, 16)
+VIT_TRANSFORM = ImageTransform(980, 224, 14)
+
+# Inferencer kwargs that have no widget; the node methods overlay the widget values
+# on top of these. The think and understanding nodes decode text greedily.
+_THINK_HYPER_DEFAULTS = MappingProxyType({
+    "do_sample": False,
+})
+
+# (H, W) for each "image_ratio" choice; both sides are multiples of the 16px latent stride
+# and the long side stays within max_latent_size * latent_downsample.
+IMAGE_RATIO_SHAPES = {
+    "1:1": (1024, 1024),
+    "4:3": (768, 1024),
+    "3:4": (1024, 768),
+    "16:9": (576, 1024),
+    "9:16": (1024, 576),
+}
+
+
+# The loaders below cache the fully prepared objects, so the in-place tweaks are
+# applied exactly once per path even when the loader node runs again.
+@functools.lru_cache(maxsize=4)
+def _load_llm_config(model_path):
+    llm_config = Qwen2Config.from_json_file(os.path.join(model_path, "llm_config.json"))
+    llm_config.qk_norm = True
+    llm_config.tie_word_embeddings = False
+    llm_config.layer_module = "Qwen2MoTDecoderLayer"
+    return llm_config
+
+
+@functools.lru_cache(maxsize=4)
+def _load_vit_config(model_path):
+    vit_config = SiglipVisionConfig.from_json_file(os.path.join(model_path, "vit_config.json"))
+    vit_config.rope = False
+    vit_config.num_hidden_layers = vit_config.num_hidden_layers - 1
+    return vit_config
+
+
+@functools.lru_cache(maxsize=4)
+def _load_tokenizer(model_path):
+    tokenizer = Qwen2Tokenizer.from_pretrained(model_path)
+    tokenizer, new_token_ids, _ = add_special_tokens(tokenizer)
+    return tokenizer, new_token_ids
+
+
+@functools.lru_cache(maxsize=8)
+def _load_edit_image(image_path, mtime):
+    # mtime is only part of the cache key, so an edited file on disk is decoded again.
+    # The resize and both transforms match what InterleaveInferencer applies to a PIL input.
+    image = VAE_TRANSFORM.resize_transform(pil_img2rgb(Image.open(image_path)))
+    return {
+        "pil": image,
+        "vae": VAE_TRANSFORM(image),
+        "vit": VIT_TRANSFORM(image),
+        "path": image_path,
+    }
+
+
+def _auto_max_memory(reserve_gib=2.0):
+    # Size the dispatch budget from what is actually free, leaving headroom for activations.
+    max_memory = {}
+    for i in range(torch.cuda.device_count()):
+        free, _ = torch.cuda.mem_get_info(i)
+        max_memory[i] = f"{max(0, free / 2**30 - reserve_gib):.1f}GiB"
+    max_memory["cpu"] = f"{int(psutil.virtual_memory().available / 2**30 * 0.75)}GiB"
+    return max_memory
+
+
+def _fits_on_device(model, device, reserve_gib=2.0):
+    # Parameter count works on the meta skeleton; bf16 is 2 bytes per element.
+    model_bytes = sum(t.numel() * 2 for t in model.parameters())
+    model_bytes += sum(t.numel() * 2 for t in model.buffers())
+    free, _ = torch.cuda.mem_get_info(device)
+    return model_bytes + reserve_gib * 2**30 <= free
+
+
+def _map_device(name, device_map):
+    # Resolve a tensor name to its placement the same way accelerate does: the longest
+    # module prefix present in the device map wins.
+    while name not in device_map:
+        if "." not in name:
+            return device_map.get("", "cpu")
+        name = name.rsplit(".", 1)[0]
+    return device_map[name]
+
+
+# Element sizes of the safetensors dtype tags, used to size the staging buffers.
+_SAFETENSORS_ITEMSIZE = {
+    "F64": 8, "I64": 8, "U64": 8,
+    "F32": 4, "I32": 4, "U32": 4,
+    "F16": 2, "BF16": 2, "I16": 2, "U16": 2,
+    "F8_E4M3": 1, "F8_E5M2": 1, "I8": 1, "U8": 1, "BOOL": 1,
+}
+
+
+def _load_checkpoint(model, checkpoint, device_map, dtype=torch.bfloat16):
+    # safe_open memory-maps the file, and assign=True binds the loaded tensors to the
+    # meta skeleton directly instead of copying them into freshly allocated parameters.
+    # Loading one top-level submodule at a time keeps only that shard resident in RAM.
+    #
+    # Tensors bound for a GPU go through two pinned staging buffers and are copied on a
+    # per-device side stream, so reading the next tensor from disk overlaps the previous
+    # H2D copy. Each staging buffer is sized to the largest tensor (embed_tokens/lm_head).
+    #
+    # Like accelerate, only floating point tensors are cast to `dtype`.
+    def loaded_nbytes(slice_):
+        tag = slice_.get_dtype()
+        itemsize = dtype.itemsize if tag.startswith(("F", "BF")) else _SAFETENSORS_ITEMSIZE[tag]
+        return math.prod(slice_.get_shape()) * itemsize
+
+    unexpected = []
+    with safe_open(checkpoint, framework="pt", device="cpu") as f:
+        keys_by_module = {}
+        devices = {}
+        for key in f.keys():
+            keys_by_module.setdefault(key.split(".", 1)[0], []).append(key)
+            devices[key] = _map_device(key, device_map)
+
+        gpu_keys = [k for k, d in devices.items() if d not in ("cpu", "disk")]
+        streams = None
+        if torch.cuda.is_available() and gpu_keys:
+            # torch.cuda.stream() only switches the stream of its own device, so every
+            # target device needs its own side stream for the copy events to cover it.
+            streams = {}
+            for k in gpu_keys:
+                devices[k] = torch.device(devices[k])
+                if devices[k] not in streams:
+                    streams[devices[k]] = torch.cuda.Stream(device=devices[k])
+            max_nbytes = max(loaded_nbytes(f.get_slice(k)) for k in gpu_keys)
+            staging = [torch.empty(max_nbytes, dtype=torch.uint8, pin_memory=True) for _ in range(2)]
+            copy_done = [None, None]
+            slot = 0
+
+        for name, keys in keys_by_module.items():
+            module = getattr(model, name, None)
+            if not isinstance(module, torch.nn.Module):
+                unexpected.extend(keys)
+                continue
+            shard = {}
+            for k in keys:
+                tensor = f.get_tensor(k)
+                if tensor.is_floating_point():
+                    tensor = tensor.to(dtype=dtype)
+                if k.endswith("embeddings.patch_embedding.weight") and tensor.dim() == 4:
+                    # Conv2d-layout patch embedding: fold it into the nn.Linear installed by
+                    # convert_conv2d_to_linear, using the same (C, kh, kw) flattening order.
+                    tensor = tensor.permute(0, 2, 3, 1).reshape(tensor.shape[0], -1)
+                device = devices[k]
+                if streams is None or device in ("cpu", "disk"):
+                    shard[k.split(".", 1)[1]] = tensor
+                    continue
+
+                # Wait until the copy that last read from this buffer has finished.
+                if copy_done[slot] is not None:
+                    copy_done[slot].synchronize()
+                nbytes = tensor.numel() * tensor.element_size()
+                pinned = staging[slot][:nbytes].view(tensor.dtype).view(tensor.shape)
+                pinned.copy_(tensor)
+                # Allocate on the default stream so the weights are not tied to the side
+                # stream in the caching allocator; only the copy itself runs on the side stream.
+                stream = streams[device]
+                dst = torch.empty(pinned.shape, dtype=pinned.dtype, device=device)
+                stream.wait_stream(torch.cuda.current_stream(device))
+                with torch.cuda.stream(stream):
+                    dst.copy_(pinned, non_blocking=True)
+                    copy_done[slot] = torch.cuda.Event()
+                    copy_done[slot].record(stream)
+                shard[k.split(".", 1)[1]] = dst
+                slot = 1 - slot
+            result = module.load_state_dict(shard, strict=False, assign=True)
+            unexpected.extend(f"{name}.{k}" for k in result.unexpected_keys)
+            del shard
+
+        if streams is not None:
+            for device, stream in streams.items():
+                torch.cuda.current_stream(device).wait_stream(stream)
+
+    if unexpected:
+        logger.warning("Unexpected keys in %s: %s", checkpoint, unexpected)
+    # Anything the checkpoint did not provide is still a meta tensor and would only fail
+    # later inside dispatch_model with an obscure "cannot copy out of meta tensor".
+    missing = [n for n, p in model.named_parameters() if p.is_meta]
+    if missing:
+        raise RuntimeError(f"Missing keys in {checkpoint}: {missing}")
+    return model
+
+
+def _quantize_understanding_experts(model):
+    # Text generation in the understanding path is bound by weight reads, so int8
+    # weight-only quantization roughly halves its cost. Only the *_moe_gen experts that
+    # process generated image tokens stay in bf16. Text and ViT tokens of every prompt,
+    # including generation and editing ones, go through the quantized projections, and
+    # the model is shared by all nodes fed by this loader, so their outputs change too.
+    try:
+        from torchao.quantization import quantize_, int8_weight_only
+    except ImportError as e:
+        raise ImportError("int8 LLM quantization requires torchao: pip install torchao") from e
+
+    quantize_(
+        model.language_model,
+        int8_weight_only(),
+        filter_fn=lambda module, fqn: isinstance(module, torch.nn.Linear) and "moe_gen" not in fqn,
+    )
+
+
+def _compile_vae_decoder(vae_model):
+    # Only the VAE decoder is compiled: it is plain convs/norms/SDPA and traces without
+    # graph breaks. The LLM decoder layers share one code object that dynamo specialises
+    # on each layer_idx, and the flash-attn and KV-cache code breaks their graphs, so
+    # compiling them mostly bought recompiles and eager fallbacks.
+    decoder = vae_model.decoder
+    compiled_forward = torch.compile(decoder.forward, dynamic=True)
+
+    def forward(*args, **kwargs):
+        # Compilation is lazy, so failures surface here. Fall back to eager for this
+        # call only rather than flipping dynamo's process-wide suppress_errors.
+        with torch._dynamo.config.patch(suppress_errors=True):
+            return compiled_forward(*args, **kwargs)
+
+    decoder.forward = forward
+
+
 class LoadBAGELModel:
     @classmethod
     def INPUT_TYPES(s):
         return {
             "required": {
                 "model_path": ("STRING", {"default": "./BAGEL-7B-MoT"}),
-            }
+            },
+            "optional": {
+                "llm_quantization": (
+                    ["none", "int8"],
+                    {
+                        "default": "none",
+                        "tooltip": "Int8 weight-only quantization of the LLM understanding experts (needs torchao). "
+                                   "Faster text decoding, but affects the output of every node fed by this loader, "
+                                   "including image generation and editing",
+                    },
+                ),
+            },
         }
 
-    RETURN_TYPES = ("MODEL", "VAEMODEL", "TOKENIZER", "VAETRANSFORM", "VITTRANSFORM", "TOKENIDS",)
-    RETURN_NAMES = ("model", "vae_model", "tokenizer", "vae_transform", "vit_transform", "new_token_ids",)
+    RETURN_TYPES = ("INFERENCER",)
+    RETURN_NAMES = ("inferencer",)
     FUNCTION = "load_model"
     CATEGORY = "BAGEL"
 
-    def load_model(self, model_path):
+    def load_model(self, model_path, llm_quantization="none"):
 
         # LLM config preparing
-        llm_config = Qwen2Config.from_json_file(os.path.join(model_path, "llm_config.json"))
-        llm_config.qk_norm = True
-        llm_config.tie_word_embeddings = False
-        llm_config.layer_module = "Qwen2MoTDecoderLayer"
+        llm_config = _load_llm_config(model_path)
         
         # ViT config preparing
-        vit_config = SiglipVisionConfig.from_json_file(os.path.join(model_path, "vit_config.json"))
-        vit_config.rope = False
-        vit_config.num_hidden_layers = vit_config.num_hidden_layers - 1
+        vit_config = _load_vit_config(model_path)
         
         # VAE loading
         vae_model, vae_config = load_ae(local_path=os.path.join(model_path, "ae.safetensors"))
+        vae_model = vae_model.to(memory_format=torch.channels_last)
         
         # Bagel config preparing
         config = BagelConfig(
@@ -83,59 +302,93 @@ class LoadBAGELModel:
             model.vit_model.vision_model.embeddings.convert_conv2d_to_linear(vit_config, meta=True)
         
         # Tokenizer Preparing
-        tokenizer = Qwen2Tokenizer.from_pretrained(model_path)
-        tokenizer, new_token_ids, _ = add_special_tokens(tokenizer)
+        tokenizer, new_token_ids = _load_tokenizer(model_path)
         
         # Image Transform Preparing
-        vae_transform = ImageTransform(1024, 512, 16)
-        vit_transform = ImageTransform(980, 224, 14)
+        vae_transform = VAE_TRANSFORM
+        vit_transform = VIT_TRANSFORM
 
-        max_mem_per_gpu = "40GiB"  # Modify it according to your GPU setting
-        
-        device_map = infer_auto_device_map(
-            model,
-            max_memory={i: max_mem_per_gpu for i in range(torch.cuda.device_count())},
-            no_split_module_classes=["Bagel", "Qwen2MoTDecoderLayer"],
-        )
-        print(device_map)
-        
-        same_device_modules = [
-            'language_model.model.embed_tokens',
-            'time_embedder',
-            'latent_pos_embed',
-            'vae2llm',
-            'llm2vae',
-            'connector',
-            'vit_pos_embed'
-        ]
-        
-        if torch.cuda.device_count() == 1:
-            first_device = device_map.get(same_device_modules[0], "cuda:0")
-            for k in same_device_modules:
-                if k in device_map:
-                    device_map[k] = first_device
-                else:
-                    device_map[k] = "cuda:0"
+        if torch.cuda.device_count() == 1 and _fits_on_device(model, 0):
+            # Nothing to split across, so skip the per-module size walk entirely.
+            device_map = {"": 0}
         else:
-            first_device = device_map.get(same_device_modules[0])
-            for k in same_device_modules:
-                if k in device_map:
-                    device_map[k] = first_device
+            device_map = infer_auto_device_map(
+                model,
+                max_memory=_auto_max_memory(),
+                no_split_module_classes=["Bagel", "Qwen2MoTDecoderLayer"],
+                dtype=torch.bfloat16,
+            )
+            logger.debug("device_map=%s", device_map)
+            
+            same_device_modules = [
+                'language_model.model.embed_tokens',
+                'time_embedder',
+                'latent_pos_embed',
+                'vae2llm',
+                'llm2vae',
+                'connector',
+                'vit_pos_embed'
+            ]
+            
+            if torch.cuda.device_count() == 1:
+                first_device = device_map.get(same_device_modules[0], "cuda:0")
+                for k in same_device_modules:
+                    if k in device_map:
+                        device_map[k] = first_device
+                    else:
+                        device_map[k] = "cuda:0"
+            else:
+                first_device = device_map.get(same_device_modules[0])
+                for k in same_device_modules:
+                    if k in device_map:
+                        device_map[k] = first_device
         
         # Thanks @onion-liu: https://github.com/ByteDance-Seed/Bagel/pull/8
-        model = load_checkpoint_and_dispatch(
+        model = _load_checkpoint(model, os.path.join(model_path, "ema.safetensors"), device_map, dtype=torch.bfloat16)
+        model = dispatch_model(
             model,
-            checkpoint=os.path.join(model_path, "ema.safetensors"),
             device_map=device_map,
             offload_buffers=True,
-            dtype=torch.bfloat16,
             force_hooks=True,
         )
         
+        # The ViT patch embedding must run as a single GEMM on flattened patches.
+        patch_embedding = model.vit_model.vision_model.embeddings.patch_embedding
+        expected_shape = (vit_config.hidden_size, vit_config.num_channels * vit_config.patch_size ** 2)
+        if not isinstance(patch_embedding, torch.nn.Linear) or tuple(patch_embedding.weight.shape) != expected_shape:
+            raise RuntimeError(
+                f"Unexpected ViT patch embedding after loading: {patch_embedding}, expected nn.Linear with "
+                f"weight shape {expected_shape}"
+            )
+
         model = model.eval()
-        print('Model loaded')
+        offloaded = any(d in ("cpu", "disk") for d in device_map.values())
+        if llm_quantization == "int8":
+            if offloaded:
+                logger.warning("Skipping int8 quantization: part of the model is offloaded to CPU/disk")
+            else:
+                _quantize_understanding_experts(model)
+        _compile_vae_decoder(vae_model)
+
+        # bf16 paths are unaffected; this lets the remaining fp32 matmuls/convs use TF32
+        # and keeps the fused SDPA backends available for attention.
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        torch.set_float32_matmul_precision("high")
+        torch.backends.cuda.enable_flash_sdp(True)
+        torch.backends.cuda.enable_mem_efficient_sdp(True)
+        logger.info("Model loaded")
 
-        return (model, vae_model, tokenizer, vae_transform, vit_transform, new_token_ids,)
+        inferencer = InterleaveInferencer(
+            model=model, 
+            vae_model=vae_model, 
+            tokenizer=tokenizer, 
+            vae_transform=vae_transform, 
+            vit_transform=vit_transform, 
+            new_token_ids=new_token_ids
+        )
+
+        return (inferencer,)
 
 
 class BagelPrompt:
@@ -175,8 +428,12 @@ class LoadEditImage:
     CATEGORY = "BAGEL"
 
     def input_image(self, image_path):
-        image = image_path
+        image = _load_edit_image(image_path, os.path.getmtime(image_path))
         return (image,)
+
+    @classmethod
+    def IS_CHANGED(s, image_path):
+        return os.path.getmtime(image_path)
         
 
 class ImageGeneration:
@@ -184,12 +441,7 @@ class ImageGeneration:
     def INPUT_TYPES(s):
         return {
             "required": {
-                "model": ("MODEL",),
-                "vae_model": ("VAEMODEL",),
-                "tokenizer": ("TOKENIZER",),
-                "vae_transform": ("VAETRANSFORM",),
-                "vit_transform": ("VITTRANSFORM",),
-                "new_token_ids": ("TOKENIDS",),
+                "inferencer": ("INFERENCER",),
                 "prompt": ("PROMPT",),
                 "seed": (
                     "INT",
@@ -201,7 +453,7 @@ class ImageGeneration:
                     },
                 ),
                 "image_ratio": (
-                    ["1:1", "4:3", "3:4", "16:9", "9:16"],
+                    list(IMAGE_RATIO_SHAPES),
                     {"default": "1:1", "tooltip": "Image aspect ratio"},
                 ),
                 "cfg_text_scale": (
@@ -286,39 +538,25 @@ class ImageGeneration:
     FUNCTION = "generate"
     CATEGORY = "BAGEL"
 
-    def generate(self, model, vae_model, tokenizer, vae_transform, vit_transform, new_token_ids, prompt, image_ratio, 
+    def generate(self, inferencer, prompt, image_ratio, 
                  seed, cfg_text_scale, cfg_img_scale, cfg_interval, timestep_shift, num_timesteps, cfg_renorm_min, 
                  cfg_renorm_type, text_temperature):
 
-        inferencer = InterleaveInferencer(
-            model=model, 
-            vae_model=vae_model, 
-            tokenizer=tokenizer, 
-            vae_transform=vae_transform, 
-            vit_transform=vit_transform, 
-            new_token_ids=new_token_ids
-        )
-
-        random.seed(seed)
-        np.random.seed(seed)
-        torch.manual_seed(seed)
-        if torch.cuda.is_available():
-            torch.cuda.manual_seed(seed)
-            torch.cuda.manual_seed_all(seed)
-        torch.backends.cudnn.deterministic = True
-        torch.backends.cudnn.benchmark = False
-
-        inference_hyper=dict(
-            cfg_text_scale=cfg_text_scale,
-            cfg_img_scale=cfg_img_scale,
-            cfg_interval=[0.4, 1.0],
-            timestep_shift=timestep_shift,
-            num_timesteps=num_timesteps,
-            cfg_renorm_min=cfg_renorm_min,
-            cfg_renorm_type=cfg_renorm_type,
-        )
+        inferencer.manual_seed(seed)
+
+        inference_hyper = {
+            "cfg_text_scale": cfg_text_scale,
+            "cfg_img_scale": cfg_img_scale,
+            "cfg_interval": (cfg_interval, 1.0),
+            "timestep_shift": timestep_shift,
+            "num_timesteps": num_timesteps,
+            "cfg_renorm_min": cfg_renorm_min,
+            "cfg_renorm_type": cfg_renorm_type,
+            "image_shapes": IMAGE_RATIO_SHAPES[image_ratio],
+        }
 
-        output_dict = inferencer(text=prompt, **inference_hyper)
+        with torch.inference_mode():
+            output_dict = inferencer(text=prompt, **inference_hyper)
         image = output_dict['image']
                     
         return (image,)
@@ -329,12 +567,7 @@ class ImageThinkGeneration:
     def INPUT_TYPES(s):
         return {
             "required": {
-                "model": ("MODEL",),
-                "vae_model": ("VAEMODEL",),
-                "tokenizer": ("TOKENIZER",),
-                "vae_transform": ("VAETRANSFORM",),
-                "vit_transform": ("VITTRANSFORM",),
-                "new_token_ids": ("TOKENIDS",),
+                "inferencer": ("INFERENCER",),
                 "prompt": ("PROMPT",),
                 "max_think_token_n": ("INT", {"default": 1000}),
                 "seed": (
@@ -347,7 +580,7 @@ class ImageThinkGeneration:
                     },
                 ),
                 "image_ratio": (
-                    ["1:1", "4:3", "3:4", "16:9", "9:16"],
+                    list(IMAGE_RATIO_SHAPES),
                     {"default": "1:1", "tooltip": "Image aspect ratio"},
                 ),
                 "cfg_text_scale": (
@@ -432,42 +665,27 @@ class ImageThinkGeneration:
     FUNCTION = "generate"
     CATEGORY = "BAGEL"
 
-    def generate(self, model, vae_model, tokenizer, vae_transform, vit_transform, new_token_ids, prompt, 
+    def generate(self, inferencer, prompt, image_ratio, 
                 seed, max_think_token_n, cfg_text_scale, cfg_img_scale, timestep_shift, num_timesteps, cfg_renorm_min, 
                 cfg_interval, cfg_renorm_type, text_temperature):
 
-        inferencer = InterleaveInferencer(
-            model=model, 
-            vae_model=vae_model, 
-            tokenizer=tokenizer, 
-            vae_transform=vae_transform, 
-            vit_transform=vit_transform, 
-            new_token_ids=new_token_ids
-        )
-
-        random.seed(seed)
-        np.random.seed(seed)
-        torch.manual_seed(seed)
-        if torch.cuda.is_available():
-            torch.cuda.manual_seed(seed)
-            torch.cuda.manual_seed_all(seed)
-        torch.backends.cudnn.deterministic = True
-        torch.backends.cudnn.benchmark = False
-
-        inference_hyper=dict(
-            max_think_token_n=max_think_token_n,
-            do_sample=False,
-            # text_temperature=0.3,
-            cfg_text_scale=cfg_text_scale,
-            cfg_img_scale=cfg_img_scale,
-            cfg_interval=[0.4, 1.0],
-            timestep_shift=timestep_shift,
-            num_timesteps=num_timesteps,
-            cfg_renorm_min=cfg_renorm_min,
-            cfg_renorm_type="global",
-        )
+        inferencer.manual_seed(seed)
+
+        inference_hyper = {
+            **_THINK_HYPER_DEFAULTS,
+            "max_think_token_n": max_think_token_n,
+            "cfg_text_scale": cfg_text_scale,
+            "cfg_img_scale": cfg_img_scale,
+            "cfg_interval": (cfg_interval, 1.0),
+            "timestep_shift": timestep_shift,
+            "num_timesteps": num_timesteps,
+            "cfg_renorm_min": cfg_renorm_min,
+            "cfg_renorm_type": cfg_renorm_type,
+            "image_shapes": IMAGE_RATIO_SHAPES[image_ratio],
+        }
         
-        output_dict = inferencer(text=prompt, think=True, **inference_hyper)
+        with torch.inference_mode():
+            output_dict = inferencer(text=prompt, think=True, **inference_hyper)
         image = output_dict['image']
         text = output_dict['text']
                     
@@ -479,12 +697,7 @@ class ImageEditing:
     def INPUT_TYPES(s):
         return {
             "required": {
-                "model": ("MODEL",),
-                "vae_model": ("VAEMODEL",),
-                "tokenizer": ("TOKENIZER",),
-                "vae_transform": ("VAETRANSFORM",),
-                "vit_transform": ("VITTRANSFORM",),
-                "new_token_ids": ("TOKENIDS",),
+                "inferencer": ("INFERENCER",),
                 "prompt": ("PROMPT",),
                 "image": ("IMAGE",),
                 "seed": (
@@ -496,10 +709,6 @@ class ImageEditing:
                         "tooltip": "Random seed, 0 for random",
                     },
                 ),
-                "image_ratio": (
-                    ["1:1", "4:3", "3:4", "16:9", "9:16"],
-                    {"default": "1:1", "tooltip": "Image aspect ratio"},
-                ),
                 "cfg_text_scale": (
                     "FLOAT",
                     {
@@ -523,7 +732,7 @@ class ImageEditing:
                 "cfg_interval": (
                     "FLOAT",
                     {
-                        "default": 0.4,
+                        "default": 0.0,
                         "min": 0.0,
                         "max": 1.0,
                         "step": 0.1,
@@ -562,7 +771,7 @@ class ImageEditing:
                 ),
                 "cfg_renorm_type": (
                     ["global", "local", "text_channel"],
-                    {"default": "global", "tooltip": "CFG re-normalization type"},
+                    {"default": "text_channel", "tooltip": "CFG re-normalization type"},
                 ),
                 "text_temperature": (
                     "FLOAT",
@@ -582,38 +791,24 @@ class ImageEditing:
     FUNCTION = "editing"
     CATEGORY = "BAGEL"
 
-    def editing(self, model, vae_model, tokenizer, vae_transform, vit_transform, new_token_ids, prompt, 
-                image, seed, cfg_text_scale, cfg_img_scale, timestep_shift, num_timesteps, cfg_renorm_min):
+    def editing(self, inferencer, prompt, 
+                image, seed, cfg_text_scale, cfg_img_scale, cfg_interval, timestep_shift, num_timesteps, 
+                cfg_renorm_min, cfg_renorm_type, text_temperature):
 
-        inferencer = InterleaveInferencer(
-            model=model, 
-            vae_model=vae_model, 
-            tokenizer=tokenizer, 
-            vae_transform=vae_transform, 
-            vit_transform=vit_transform, 
-            new_token_ids=new_token_ids
-        )
+        inferencer.manual_seed(seed)
 
-        random.seed(seed)
-        np.random.seed(seed)
-        torch.manual_seed(seed)
-        if torch.cuda.is_available():
-            torch.cuda.manual_seed(seed)
-            torch.cuda.manual_seed_all(seed)
-        torch.backends.cudnn.deterministic = True
-        torch.backends.cudnn.benchmark = False
-
-        inference_hyper=dict(
-            cfg_text_scale=cfg_text_scale,
-            cfg_img_scale=cfg_img_scale,
-            cfg_interval=[0.0, 1.0],
-            timestep_shift=timestep_shift,
-            num_timesteps=num_timesteps,
-            cfg_renorm_min=cfg_renorm_min,
-            cfg_renorm_type="text_channel",
-        )
+        inference_hyper = {
+            "cfg_text_scale": cfg_text_scale,
+            "cfg_img_scale": cfg_img_scale,
+            "cfg_interval": (cfg_interval, 1.0),
+            "timestep_shift": timestep_shift,
+            "num_timesteps": num_timesteps,
+            "cfg_renorm_min": cfg_renorm_min,
+            "cfg_renorm_type": cfg_renorm_type,
+        }
         
-        output_dict = inferencer(image=image, text=prompt, **inference_hyper)
+        with torch.inference_mode():
+            output_dict = inferencer(image=image, text=prompt, **inference_hyper)
         image = output_dict['image']
                     
         return (image,)
@@ -624,12 +819,7 @@ class ImageThinkEditing:
     def INPUT_TYPES(s):
         return {
             "required": {
-                "model": ("MODEL",),
-                "vae_model": ("VAEMODEL",),
-                "tokenizer": ("TOKENIZER",),
-                "vae_transform": ("VAETRANSFORM",),
-                "vit_transform": ("VITTRANSFORM",),
-                "new_token_ids": ("TOKENIDS",),
+                "inferencer": ("INFERENCER",),
                 "prompt": ("PROMPT",),
                 "image": ("IMAGE",),
                 "max_think_token_n": ("INT", {"default": 1000}),
@@ -642,10 +832,6 @@ class ImageThinkEditing:
                         "tooltip": "Random seed, 0 for random",
                     },
                 ),
-                "image_ratio": (
-                    ["1:1", "4:3", "3:4", "16:9", "9:16"],
-                    {"default": "1:1", "tooltip": "Image aspect ratio"},
-                ),
                 "cfg_text_scale": (
                     "FLOAT",
                     {
@@ -669,7 +855,7 @@ class ImageThinkEditing:
                 "cfg_interval": (
                     "FLOAT",
                     {
-                        "default": 0.4,
+                        "default": 0.0,
                         "min": 0.0,
                         "max": 1.0,
                         "step": 0.1,
@@ -708,7 +894,7 @@ class ImageThinkEditing:
                 ),
                 "cfg_renorm_type": (
                     ["global", "local", "text_channel"],
-                    {"default": "global", "tooltip": "CFG re-normalization type"},
+                    {"default": "text_channel", "tooltip": "CFG re-normalization type"},
                 ),
                 "text_temperature": (
                     "FLOAT",
@@ -728,41 +914,26 @@ class ImageThinkEditing:
     FUNCTION = "editing"
     CATEGORY = "BAGEL"
 
-    def editing(self, model, vae_model, tokenizer, vae_transform, vit_transform, new_token_ids, prompt, 
-                image, seed, max_think_token_n, cfg_text_scale, cfg_img_scale, timestep_shift, num_timesteps, cfg_renorm_min):
-
-        inferencer = InterleaveInferencer(
-            model=model, 
-            vae_model=vae_model, 
-            tokenizer=tokenizer, 
-            vae_transform=vae_transform, 
-            vit_transform=vit_transform, 
-            new_token_ids=new_token_ids
-        )
-
-        random.seed(seed)
-        np.random.seed(seed)
-        torch.manual_seed(seed)
-        if torch.cuda.is_available():
-            torch.cuda.manual_seed(seed)
-            torch.cuda.manual_seed_all(seed)
-        torch.backends.cudnn.deterministic = True
-        torch.backends.cudnn.benchmark = False
-
-        inference_hyper=dict(
-            max_think_token_n=max_think_token_n,
-            do_sample=False,
-            # text_temperature=0.3,
-            cfg_text_scale=cfg_text_scale,
-            cfg_img_scale=cfg_img_scale,
-            cfg_interval=[0.0, 1.0],
-            timestep_shift=timestep_shift,
-            num_timesteps=num_timesteps,
-            cfg_renorm_min=cfg_renorm_min,
-            cfg_renorm_type="text_channel",
-        )
+    def editing(self, inferencer, prompt, 
+                image, seed, max_think_token_n, cfg_text_scale, cfg_img_scale, cfg_interval, timestep_shift, 
+                num_timesteps, cfg_renorm_min, cfg_renorm_type, text_temperature):
+
+        inferencer.manual_seed(seed)
+
+        inference_hyper = {
+            **_THINK_HYPER_DEFAULTS,
+            "max_think_token_n": max_think_token_n,
+            "cfg_text_scale": cfg_text_scale,
+            "cfg_img_scale": cfg_img_scale,
+            "cfg_interval": (cfg_interval, 1.0),
+            "timestep_shift": timestep_shift,
+            "num_timesteps": num_timesteps,
+            "cfg_renorm_min": cfg_renorm_min,
+            "cfg_renorm_type": cfg_renorm_type,
+        }
 
-        output_dict = inferencer(image=image, text=prompt, think=True, **inference_hyper)
+        with torch.inference_mode():
+            output_dict = inferencer(image=image, text=prompt, think=True, **inference_hyper)
         image = output_dict['image']
         text = output_dict['text']
                     
@@ -774,12 +945,7 @@ class ImageUnderstanding:
     def INPUT_TYPES(s):
         return {
             "required": {
-                "model": ("MODEL",),
-                "vae_model": ("VAEMODEL",),
-                "tokenizer": ("TOKENIZER",),
-                "vae_transform": ("VAETRANSFORM",),
-                "vit_transform": ("VITTRANSFORM",),
-                "new_token_ids": ("TOKENIDS",),
+                "inferencer": ("INFERENCER",),
                 "prompt": ("PROMPT",),
                 "image": ("IMAGE",),
                 "seed": ("INT", {"default": 42}),
@@ -792,34 +958,18 @@ class ImageUnderstanding:
     FUNCTION = "understanding"
     CATEGORY = "BAGEL"
 
-    def understanding(self, model, vae_model, tokenizer, vae_transform, vit_transform, new_token_ids, prompt, 
+    def understanding(self, inferencer, prompt, 
                 image, seed, max_think_token_n):
 
-        inferencer = InterleaveInferencer(
-            model=model, 
-            vae_model=vae_model, 
-            tokenizer=tokenizer, 
-            vae_transform=vae_transform, 
-            vit_transform=vit_transform, 
-            new_token_ids=new_token_ids
-        )
+        inferencer.manual_seed(seed)
 
-        random.seed(seed)
-        np.random.seed(seed)
-        torch.manual_seed(seed)
-        if torch.cuda.is_available():
-            torch.cuda.manual_seed(seed)
-            torch.cuda.manual_seed_all(seed)
-        torch.backends.cudnn.deterministic = True
-        torch.backends.cudnn.benchmark = False
-
-        inference_hyper=dict(
-            max_think_token_n=1000,
-            do_sample=False,
-            # text_temperature=0.3,
-        )
+        inference_hyper = {
+            **_THINK_HYPER_DEFAULTS,
+            "max_think_token_n": max_think_token_n,
+        }
 
-        output_dict = inferencer(image=image, text=prompt, understanding_output=True, **inference_hyper)
+        with torch.inference_mode():
+            output_dict = inferencer(image=image, text=prompt, understanding_output=True, **inference_hyper)
         text = output_dict['text']
                     
         return (text,)